@@ -4,8 +4,12 @@ License: 3-clause BSD (see https://opensource.org/licenses/BSD-3-Clause)
 Author: Hubert Tournier
 """
 
+import atexit
+import concurrent.futures
+import functools
 import getopt
 import gzip
+import io
 import logging
 import os
 import re
@@ -26,6 +30,79 @@ parameters = {
     "Print type" : False,
 }
 
+# Precompiled regular expressions, to skip the re cache lookup in text processing loops:
+_RE_CONTROL_ONLY = re.compile(r"^\.[ \t]*$")
+_RE_COMMENT_LINE = re.compile(r'^\.\\".*')
+_RE_COMMENT_TAIL = re.compile(r'\\".*')
+_RE_GNU_COMMENT_TAIL = re.compile(r"\\#.*")
+_RE_FONT_STYLE_MACRO = re.compile(r"^\.(B|BI|BR|CB|CI|CR|CW|I|IB|IR|LG|NL|P|R|RB|RI|SB|SM) +")
+_RE_WHITESPACE_RUN = re.compile(r"[ \t]+")
+_RE_DASH_RUN = re.compile(r"-+")
+_RE_BEFORE_DASH = re.compile(r".* - ")
+_RE_FIRST_DASH = re.compile(r" - ")
+_RE_AFTER_DASH = re.compile(r" - .*")
+_RE_NM_MACRO = re.compile(r"^\.Nm ")
+_RE_TRAILING_COMMA = re.compile(r" *,? *$")
+_RE_SPACED_COMMA = re.compile(r" *,")
+_RE_ND_MACRO = re.compile(r"^\.Nd *\"?")
+_RE_TRAILING_QUOTE = re.compile(r"\"? *$")
+_RE_AT_MACRO = re.compile(r"^\.At *")
+_RE_AT_VERSION = re.compile(r"^v")
+_RE_AT_SYSV_RELEASE = re.compile(r"^V\.")
+_RE_BX_MACRO = re.compile(r"^\.Bx *")
+_RE_BX_ALPHA = re.compile(r"-alpha")
+_RE_BX_BETA = re.compile(r"-beta")
+_RE_BX_DEVEL = re.compile(r"-devel")
+_RE_BX_43_VARIANT = re.compile(r"4\.3 ([Tt]ahoe|[Rr]eno)")
+_RE_SINGLE_SPACE = re.compile(r" ")
+_RE_BX_44_LITE = re.compile(r"4\.4 [Ll]ite2?")
+_RE_BX_44_LITE_PREFIX = re.compile(r"4\.4 [Ll]ite")
+_RE_BSX_MACRO = re.compile(r"^\.Bsx")
+_RE_NX_MACRO = re.compile(r"^\.Nx")
+_RE_FX_MACRO = re.compile(r"^\.Fx")
+_RE_OX_MACRO = re.compile(r"^\.Ox")
+_RE_DX_MACRO = re.compile(r"^\.Dx")
+_RE_DQ_MACRO = re.compile(r"^\.Dq ")
+_RE_TRAILING_SPACES = re.compile(r" *$")
+_RE_DOUBLED_QUOTES = re.compile(r'""')
+_RE_PA_MACRO = re.compile(r"^\.Pa ")
+_RE_XR_MACRO = re.compile(r"^\.Xr ")
+_RE_LEADING_MACRO = re.compile(r"^\.[A-Za-z]+ \"?")
+_RE_LAST_DOT_PREFIX = re.compile(r"^.*\.")
+_RE_FILE_EXTENSION = re.compile(r"\.[A-Za-z0-9]*$")
+_RE_NON_EMPTY_EXTENSION = re.compile(r"\.[A-Za-z0-9]+$")
+_RE_USER_DEFINED_STRING = re.compile(r"\\(?:\*(?:\((..)|\[([^\]]*)\]|(.))|(.))")
+
+# Single character deletions are a one-pass C-level operation with str.translate():
+_QUOTE_DELETION = str.maketrans("", "", '"')
+
+# Multi-prefix tests done in a single C-level startswith() call:
+_NAME_PREFIXES = (".SH NAME", '.SH "NAME"')
+_TH_PREFIXES = (".TH", ".Dt")
+_SO_PREFIXES = (".SO", ".so")
+
+# Sampled in main() once the environment variables and command line are processed,
+# so the hot loops can skip disabled logging.debug() calls entirely:
+_DEBUG_ENABLED = False
+
+# Special characters replacement table,
+# and a single alternation matching them all so the input text is scanned only once.
+# Font escapes (\f...) and the end of line backslash map to the empty string default:
+_SPECIAL_CHARACTERS = {
+    r"\&": "",
+    r"\.": ".",
+    r"\-": "-",
+    r"\(aq": "'",
+    r"\(em": "",
+    r"\(tm": "tm",
+    r"\(lq": '"',
+    r"\(rq": '"',
+    r"\[rg]": "(R)",
+}
+_RE_SPECIAL_CHARACTERS = re.compile(
+    r"\\f\\\*\[[^\]]*\]|\\f[^*]|\\\(aq|\\\(em|\\\(tm|\\\([lr]q|\\\[rg\]|\\&|\\\.|\\-| *\\$"
+)
+
 
 ################################################################################
 def initialize_debugging(program_name):
@@ -158,10 +235,11 @@ def process_command_line():
             print(ID.replace("@(" + "#)" + " $" + "Id" + ": ", "").replace(" $", ""))
             sys.exit(0)
 
-    logging.debug("process_command_line(): parameters:")
-    logging.debug(parameters)
-    logging.debug("process_command_line(): remaining_arguments:")
-    logging.debug(remaining_arguments)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("process_command_line(): parameters:")
+        logging.debug(parameters)
+        logging.debug("process_command_line(): remaining_arguments:")
+        logging.debug(remaining_arguments)
 
     return remaining_arguments
 
@@ -190,18 +268,18 @@ def strip_roff_comments(text):
 
     # Request lines with only a control character and optional trailing
     # whitespace are stripped from input:
-    text = re.sub(r"^\.[ 	]*$", "", text)
+    text = _RE_CONTROL_ONLY.sub("", text)
 
     # A request line beginning with a control character and comment escape '.\"'
     # is also ignored:
-    text = re.sub(r'^\.\\".*', "", text)
+    text = _RE_COMMENT_LINE.sub("", text)
 
     # Text following an escaped double-quote '\"', whether in a request, macro,
     # or text line, is ignored to the end of the line:
-    text = re.sub(r'\\".*', "", text)
+    text = _RE_COMMENT_TAIL.sub("", text)
 
     # The '\#' GNU troff(1) extension does the same:
-    text = re.sub(r"\\#.*", "", text)
+    text = _RE_GNU_COMMENT_TAIL.sub("", text)
 
     return text
 
@@ -210,7 +288,14 @@ def strip_roff_comments(text):
 def strip_roff_font_style_macros(text):
     """Remove *roff(7) font style macros in the input text"""
 
-    return re.sub(r"^\.(B|BI|BR|CB|CI|CR|CW|I|IB|IR|LG|NL|P|R|RB|RI|SB|SM) +", "", text)
+    return _RE_FONT_STYLE_MACRO.sub("", text)
+
+
+################################################################################
+def _replace_special_character(match):
+    """Return the replacement for a single matched *roff(7) special character"""
+
+    return _SPECIAL_CHARACTERS.get(match.group(0), "")
 
 
 ################################################################################
@@ -219,23 +304,9 @@ def replace_roff_special_characters(text):
 
     if "\\" in text:
         # See https://www.freebsd.org/cgi/man.cgi?query=mandoc_char for a complete list
-        text = re.sub(r"\\&", "", text)
-        text = re.sub(r"\\\.", ".", text)
-        text = re.sub(r"\\-", "-", text)
-        text = re.sub(r"\\\(aq", "'", text)
-        text = re.sub(r"\\\(em", "", text)
-        text = re.sub(r"\\\(tm", "tm", text)
-        text = re.sub(r"\\\([lr]q", '"', text)
-        text = re.sub(r"\\\[rg\]", "(R)", text)
-
-        # Don't process user defined strings (\*) beside the font style ones:
-        text = re.sub(r"\\f\\\*\[[^\]]*\]", "", text)
-        text = re.sub(r"\\f[^\*]", "", text)
-
-        # End of line backslash:
-        text = re.sub(r" *\\$", "", text)
-
+        # Don't process user defined strings (\*) beside the font style ones
         # "\ " is not processed as it may still be useful
+        text = _RE_SPECIAL_CHARACTERS.sub(_replace_special_character, text)
 
     return text
 
@@ -247,367 +318,537 @@ def replace_roff_user_defined_strings(text, user_defined_strings):
     if "\\*" not in text:
         return text
 
-    new_text = ""
-    slash = False
-    star = False
-    in_short_key = False
-    in_long_key = False
-    key = ""
-
-    for character in text:
-        if character == "\\":
-            slash = True
-        elif slash:
-            slash = False
-            if character == "*":
-                star = True
-            else:
-                new_text += character
-        elif star:
-            star = False
-            if character == "(":
-                in_short_key = True
-            elif character == "[":
-                in_long_key = True
-            else:
-                if character in user_defined_strings.keys():
-                    new_text += user_defined_strings[character]
-                elif character == "R":
-                    new_text += "(Reg.)"
-                elif character == "S":
-                    pass
-                else:
-                    logging.debug("UNDEFINED user defined string: %s", character)
-        elif in_short_key:
-            key += character
-            if len(key) == 2:
-                in_short_key = False
-                if key in user_defined_strings.keys():
-                    new_text += user_defined_strings[key]
-                elif key in ("lq", "rq"):
-                    new_text += '"'
-                elif key == "Tm":
-                    new_text += "(TM)"
-                else:
-                    logging.debug("UNDEFINED user defined string: %s", key)
-        elif in_long_key:
-            if character == "]":
-                in_long_key = False
-                if key in user_defined_strings.keys():
-                    new_text += user_defined_strings[key]
-                else:
-                    logging.debug("UNDEFINED user defined string: %s", key)
-            else:
-                key += character
-        else:
-            new_text += character
+    def _replace(match):
+        short_key, long_key, character, escaped = match.groups()
+        if escaped is not None:
+            # A plain \X escape: keep the escaped character:
+            return escaped
+        if character is not None:
+            if character in user_defined_strings:
+                return user_defined_strings[character]
+            if character == "R":
+                return "(Reg.)"
+            if character == "S":
+                return ""
+            if _DEBUG_ENABLED:
+                logging.debug("UNDEFINED user defined string: %s", character)
+            return ""
+        if short_key is not None:
+            if short_key in user_defined_strings:
+                return user_defined_strings[short_key]
+            if short_key in ("lq", "rq"):
+                return '"'
+            if short_key == "Tm":
+                return "(TM)"
+            if _DEBUG_ENABLED:
+                logging.debug("UNDEFINED user defined string: %s", short_key)
+            return ""
+        if long_key in user_defined_strings:
+            return user_defined_strings[long_key]
+        if _DEBUG_ENABLED:
+            logging.debug("UNDEFINED user defined string: %s", long_key)
+        return ""
+
+    return _RE_USER_DEFINED_STRING.sub(_replace, text)
+
+
+################################################################################
+def _handle_mdoc_nm(text_line, state):
+    """Handle a .Nm (manual name) macro line:
+    - there may be several of them
+    - the first ones should end with a comma for multi-commands man pages
+    - may contain space+comma separation on the same line
+    - may be enclosed in double quotes if they contain a white space
+    - the filename is always mentioned, even if absent from the manual page file
+    """
+    text_line = _RE_NM_MACRO.sub("", text_line)
+    text_line = _RE_TRAILING_COMMA.sub("", text_line)
+    text_line = _RE_SPACED_COMMA.sub(",", text_line)
+    text_line = text_line.translate(_QUOTE_DELETION)
+    items = state["items"]
+    items_set = state["items set"]
+    if "," not in text_line:
+        if text_line not in items_set:
+            items.append(text_line)
+            items_set.add(text_line)
+    else:
+        for man_item in text_line.replace(" ", "").split(","):
+            if man_item and man_item not in items_set:
+                items.append(man_item)
+                items_set.add(man_item)
 
-    return new_text
+    return text_line
 
 
 ################################################################################
-def whatis(filename, section, basename, nb_of_so_redirections):
-    """Show the entry name and its one line description, whatis(1) like"""
-    logging.debug("mtoc.whatis(%s):", filename)
+def _handle_mdoc_nd(text_line, state):
+    """Handle a .Nd (one-line manual description) macro line:
+    - may be alone on its line
+    - may span on more than one line
+    - may be enclosed in double quotes
+    """
+    text_line = _RE_ND_MACRO.sub("", text_line)
+    text_line = _RE_TRAILING_QUOTE.sub("", text_line)
+    if text_line:
+        state["whatis text"] += "(" + state["section"] + ") - " + text_line
+    else:
+        state["whatis text"] += "(" + state["section"] + ") -"
 
-    file_content = None
-    if filename.endswith(".gz"):
-        with gzip.open(filename, "rb") as file:
-            file_content = file.readlines()
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_section(text_line, state):
+    """Handle a .Sh or .Ss macro line ending the NAME section"""
+    state["items"].sort()
+    state["whatis text"] = ", ".join(state["items"]) + state["whatis text"]
+    state["done"] = True
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_ux(text_line, state):
+    """Handle a .Ux (UNIX) macro line"""
+    state["whatis text"] += " UNIX"
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_at(text_line, state):
+    """Handle a .At (AT&T UNIX) macro line"""
+    text_line = _RE_AT_MACRO.sub("", text_line)
+    if not text_line:
+        state["whatis text"] += " AT&T UNIX"
+    elif text_line.startswith("v"):
+        text_line = _RE_AT_VERSION.sub("Version ", text_line)
+        state["whatis text"] += " " + text_line + " AT&T UNIX"
+    elif text_line.startswith("32v"):
+        state["whatis text"] += " Version 32V AT&T UNIX"
+    elif text_line.startswith("III"):
+        state["whatis text"] += " AT&T System III UNIX"
+    elif text_line.startswith("V."):
+        text_line = _RE_AT_SYSV_RELEASE.sub("AT&T System V Release ", text_line)
+        state["whatis text"] += " " + text_line + " UNIX"
+    elif text_line.startswith("V"):
+        state["whatis text"] += " AT&T System V UNIX"
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_bx(text_line, state):
+    """Handle a .Bx (BSD) macro line"""
+    text_line = _RE_BX_MACRO.sub("", text_line)
+    text_line = _RE_BX_ALPHA.sub(" (currently in alpha test)", text_line)
+    text_line = _RE_BX_BETA.sub(" (currently in beta test)", text_line)
+    text_line = _RE_BX_DEVEL.sub(" (currently under development)", text_line)
+    if not text_line:
+        state["whatis text"] += " BSD"
+    elif _RE_BX_43_VARIANT.match(text_line):
+        text_line = _RE_SINGLE_SPACE.sub("  ", text_line)
+        state["whatis text"] += " " + text_line + "BSD"
+    elif _RE_BX_44_LITE.match(text_line):
+        text_line = _RE_BX_44_LITE_PREFIX.sub("4.4BSD-Lite", text_line)
+        state["whatis text"] += " " + text_line
     else:
-        with open(filename, "rb") as file:
-            file_content = file.readlines()
-
-    in_mandoc_section_name = False
-    in_mdoc_section_name = False
-    in_multi_line_macro = False
-    in_description = False
-    whatis_text = ""
-    items = [ basename ]
-    defined_strings = {}
-    for line in file_content:
-        text_line = line.decode("utf-8", "replace").rstrip()
-        text_line = strip_roff_comments(text_line)
-
-        if text_line:
-            if in_mandoc_section_name:
-                if not text_line.startswith(".SH"):
-                    logging.debug(text_line)
+        state["whatis text"] += " " + text_line + "BSD"
 
-                text_line = strip_roff_font_style_macros(text_line)
-                text_line = replace_roff_special_characters(text_line)
-                text_line = replace_roff_user_defined_strings(text_line, defined_strings)
+    return text_line
 
-                # Kludge for groff_hdtbl(7) or I should support if/ie macros:
-                text_line = text_line.replace('\\..', "")
 
-                text_line = text_line.replace("\\\\", "\\")
-                text_line = re.sub(r"\\ ", " ", text_line)
-                text_line = re.sub(r"[ 	]+", " ", text_line)
-                text_line = re.sub(r"-+", "-", text_line)
+################################################################################
+def _handle_mdoc_bsx(text_line, state):
+    """Handle a .Bsx (BSD/OS) macro line"""
+    text_line = _RE_BSX_MACRO.sub("BSD/OS", text_line)
+    state["whatis text"] += " " + text_line
 
-                # .SH NAME section end macro line:
-                if text_line.startswith(".SH") or text_line.startswith(".SS"):
-                    items.sort()
-                    if whatis_text.startswith("("):
-                        whatis_text = ", ".join(items) + whatis_text
-                    else:
-                        # Print the section number if no one line description is provided:
-                        whatis_text = ", ".join(items) + "(" + section + ") - " + whatis_text
-                    break
-
-                # .ig or .de multi lines macros handling (see groff_out(5)) :
-                if text_line.startswith(".ig") or text_line.startswith(".de"):
-                    in_multi_line_macro = True
-                    continue
-                if in_multi_line_macro:
-                    if text_line.startswith(".."):
-                        in_multi_line_macro = False
-                    continue
-
-                # Skip other macros
-                if text_line.startswith("."):
-                    continue
-
-                if not in_description:
-                    if text_line.startswith("-"):
-                        in_description = True
-                        whatis_text = "(" + section + ") " + text_line
-                        text_line = ""
-
-                    elif " - " in text_line:
-                        in_description = True
-                        description = re.sub(r".* - ", "", text_line)
-                        whatis_text = re.sub(r" - ", "(" + section + ") - ", description, count=1)
-
-                        text_line = re.sub(r" - .*", "", text_line)
-
-                    if text_line:
-                        if "," not in text_line:
-                            if text_line not in items:
-                                items.append(text_line)
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_nx(text_line, state):
+    """Handle a .Nx (NetBSD) macro line"""
+    text_line = _RE_NX_MACRO.sub("NetBSD", text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_fx(text_line, state):
+    """Handle a .Fx (FreeBSD) macro line"""
+    text_line = _RE_FX_MACRO.sub("FreeBSD", text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_ox(text_line, state):
+    """Handle a .Ox (OpenBSD) macro line"""
+    text_line = _RE_OX_MACRO.sub("OpenBSD", text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_dx(text_line, state):
+    """Handle a .Dx (DragonFly) macro line"""
+    text_line = _RE_DX_MACRO.sub("DragonFly", text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_dq(text_line, state):
+    """Handle a .Dq TEXT macro line:
+    - the TEXT is sometimes already double quoted (ie. big(5))
+    """
+    if parameters["Interpret Dq"]:
+        text_line = _RE_DQ_MACRO.sub('"', text_line)
+        text_line = _RE_TRAILING_SPACES.sub('"', text_line)
+        text_line = _RE_DOUBLED_QUOTES.sub('"', text_line)
+    else:
+        text_line = _RE_DQ_MACRO.sub("", text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_pa(text_line, state):
+    """Handle a .Pa PATH macro line"""
+    text_line = _RE_PA_MACRO.sub(parameters["Interpret Pa"], text_line)
+    text_line = _RE_TRAILING_SPACES.sub(parameters["Interpret Pa"], text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+################################################################################
+def _handle_mdoc_xr(text_line, state):
+    """Handle a .Xr MAN_ITEM MAN_SECTION macro line"""
+    text_line = _RE_XR_MACRO.sub("", text_line)
+    if parameters["Interpret Xr"]:
+        text_line = _RE_SINGLE_SPACE.sub("(", text_line, count=1)
+        text_line = _RE_TRAILING_SPACES.sub(")", text_line)
+    state["whatis text"] += " " + text_line
+
+    return text_line
+
+
+# Dispatch table for the mdoc macros handled in the NAME section,
+# keyed by the first word of the line for a single hash lookup
+# instead of a chain of startswith() tests:
+_MDOC_HANDLERS = {
+    ".Nm": _handle_mdoc_nm,
+    ".Nd": _handle_mdoc_nd,
+    ".Sh": _handle_mdoc_section,
+    ".Ss": _handle_mdoc_section,
+    ".Ux": _handle_mdoc_ux,
+    ".At": _handle_mdoc_at,
+    ".Bx": _handle_mdoc_bx,
+    ".Bsx": _handle_mdoc_bsx,
+    ".Nx": _handle_mdoc_nx,
+    ".Fx": _handle_mdoc_fx,
+    ".Ox": _handle_mdoc_ox,
+    ".Dx": _handle_mdoc_dx,
+    ".Dq": _handle_mdoc_dq,
+    ".Pa": _handle_mdoc_pa,
+    ".Xr": _handle_mdoc_xr,
+}
+
+
+################################################################################
+@functools.lru_cache(maxsize=256)
+def _read_manpage(filename):
+    """Return the raw content of a man page file, caching .so redirection targets"""
+    if filename.endswith(".gz"):
+        with gzip.open(filename, "rb") as file:
+            return file.read()
+
+    with open(filename, "rb") as file:
+        return file.read()
+
+
+################################################################################
+def whatis(filename, section, basename, nb_of_so_redirections):
+    """Return the entry name and its one line description, whatis(1) like,
+    or None when there's nothing to show"""
+    # Local bindings are cheaper than repeated dict lookups in the per-line loop:
+    no_man_pages = parameters["No man pages"]
+    no_mdoc_pages = parameters["No mdoc pages"]
+    print_type = parameters["Print type"]
+
+    # .so redirections restart the per-file processing iteratively
+    # instead of through recursive calls:
+    while True:
+        if _DEBUG_ENABLED:
+            logging.debug("mtoc.whatis(%s):", filename)
+
+        file_content = _read_manpage(filename)
+
+        in_mandoc_section_name = False
+        in_mdoc_section_name = False
+        in_multi_line_macro = False
+        in_description = False
+        redirected = False
+        whatis_text = ""
+        items = [ basename ]
+        # A parallel set makes the membership tests O(1) while the list keeps the order:
+        items_set = { basename }
+        defined_strings = {}
+        state = {
+            "section": section,
+            "items": items,
+            "items set": items_set,
+            "whatis text": "",
+            "done": False,
+        }
+        # A single decode over the whole file is much cheaper than one per line:
+        for text_line in file_content.decode("utf-8", "replace").splitlines():
+            # Blank and whole-line comment lines never contribute to output,
+            # so skip them before the comment stripping regexes run:
+            if not text_line or text_line.startswith(('.\\"', '\\"')):
+                continue
+
+            text_line = strip_roff_comments(text_line.rstrip())
+
+            if text_line:
+                if in_mandoc_section_name:
+                    if _DEBUG_ENABLED and not text_line.startswith(".SH"):
+                        logging.debug(text_line)
+
+                    # Macro lines that would only be discarded below can skip the
+                    # costly substitutions right away (the later checks still catch
+                    # escapes turning into macros during processing):
+                    if not in_multi_line_macro \
+                    and text_line.startswith(".") \
+                    and not text_line.startswith((".SH", ".SS", ".ig", ".de")) \
+                    and _RE_FONT_STYLE_MACRO.match(text_line) is None:
+                        continue
+
+                    text_line = strip_roff_font_style_macros(text_line)
+                    text_line = replace_roff_special_characters(text_line)
+                    text_line = replace_roff_user_defined_strings(text_line, defined_strings)
+
+                    # Kludge for groff_hdtbl(7) or I should support if/ie macros:
+                    text_line = text_line.replace('\\..', "")
+
+                    text_line = text_line.replace("\\\\", "\\")
+                    # str.replace() and substring guards let the common case
+                    # (lines without runs to collapse) skip the regex passes:
+                    text_line = text_line.replace("\\ ", " ")
+                    if "\t" in text_line or "  " in text_line:
+                        text_line = _RE_WHITESPACE_RUN.sub(" ", text_line)
+                    if "--" in text_line:
+                        text_line = _RE_DASH_RUN.sub("-", text_line)
+
+                    # .SH NAME section end macro line:
+                    if text_line.startswith((".SH", ".SS")):
+                        items.sort()
+                        if whatis_text.startswith("("):
+                            whatis_text = ", ".join(items) + whatis_text
                         else:
-                            for man_item in text_line.replace(" ", "").split(","):
-                                if man_item and man_item not in items:
-                                    items.append(man_item)
+                            # Print the section number if no one line description is provided:
+                            whatis_text = ", ".join(items) + "(" + section + ") - " + whatis_text
+                        break
+
+                    # .ig or .de multi lines macros handling (see groff_out(5)) :
+                    if text_line.startswith((".ig", ".de")):
+                        in_multi_line_macro = True
+                        continue
+                    if in_multi_line_macro:
+                        if text_line.startswith(".."):
+                            in_multi_line_macro = False
+                        continue
+
+                    # Skip other macros
+                    if text_line.startswith("."):
+                        continue
+
+                    if not in_description:
+                        if text_line.startswith("-"):
+                            in_description = True
+                            whatis_text = "(" + section + ") " + text_line
+                            text_line = ""
+
+                        elif " - " in text_line:
+                            in_description = True
+                            description = _RE_BEFORE_DASH.sub("", text_line)
+                            whatis_text = _RE_FIRST_DASH.sub("(" + section + ") - ", description, count=1)
+
+                            text_line = _RE_AFTER_DASH.sub("", text_line)
+
+                        if text_line:
+                            if "," not in text_line:
+                                if text_line not in items_set:
+                                    items.append(text_line)
+                                    items_set.add(text_line)
+                            else:
+                                for man_item in text_line.replace(" ", "").split(","):
+                                    if man_item and man_item not in items_set:
+                                        items.append(man_item)
+                                        items_set.add(man_item)
+
+                    elif text_line:
+                        whatis_text += " " + text_line
 
-                elif text_line:
-                    whatis_text += " " + text_line
+                elif in_mdoc_section_name:
+                    if _DEBUG_ENABLED and not text_line.startswith(".Sh"):
+                        logging.debug(text_line)
+
+                    # Unhandled macro lines can likewise skip the substitutions:
+                    if text_line.startswith(".") \
+                    and text_line.partition(" ")[0] not in _MDOC_HANDLERS \
+                    and _RE_FONT_STYLE_MACRO.match(text_line) is None:
+                        continue
+
+                    text_line = strip_roff_font_style_macros(text_line)
+                    text_line = replace_roff_special_characters(text_line)
+                    text_line = replace_roff_user_defined_strings(text_line, defined_strings)
+                    text_line = text_line.replace("\\\\", "\\")
+                    # str.replace() and substring guards let the common case
+                    # (lines without runs to collapse) skip the regex passes:
+                    text_line = text_line.replace("\\ ", " ")
+                    if "\t" in text_line or "  " in text_line:
+                        text_line = _RE_WHITESPACE_RUN.sub(" ", text_line)
+                    if "--" in text_line:
+                        text_line = _RE_DASH_RUN.sub("-", text_line)
+
+                    # Macro lines are dispatched through a single hash lookup on their
+                    # first word (the .Sh/.Ss handler ends the NAME section):
+                    handler = _MDOC_HANDLERS.get(text_line.partition(" ")[0])
+                    if handler is not None:
+                        text_line = handler(text_line, state)
+                        if state["done"]:
+                            break
+
+                    # Skip other macros
+                    elif text_line.startswith("."):
+                        continue
+
+                    # .Nd (one-line manual description) continuation text line handling:
+                    # - may start with a .Xx macro
+                    # - may be enclosed in double quotes
+                    elif text_line.strip():
+                        text_line = _RE_LEADING_MACRO.sub("", text_line)
+                        text_line = _RE_TRAILING_QUOTE.sub("", text_line)
+                        state["whatis text"] += " " + text_line
+
+            if text_line.startswith(_NAME_PREFIXES) \
+            and not no_man_pages:
+                if _DEBUG_ENABLED:
+                    logging.debug(text_line)
+                in_mandoc_section_name = True
 
-            elif in_mdoc_section_name:
-                if not text_line.startswith(".Sh"):
+            elif text_line.startswith(".Sh NAME") \
+            and not no_mdoc_pages:
+                if _DEBUG_ENABLED:
                     logging.debug(text_line)
+                in_mdoc_section_name = True
 
-                text_line = strip_roff_font_style_macros(text_line)
-                text_line = replace_roff_special_characters(text_line)
+            elif text_line.startswith(_TH_PREFIXES):
+                if _DEBUG_ENABLED:
+                    logging.debug(text_line)
                 text_line = replace_roff_user_defined_strings(text_line, defined_strings)
-                text_line = text_line.replace("\\\\", "\\")
-                text_line = re.sub(r"\\ ", " ", text_line)
-                text_line = re.sub(r"[ 	]+", " ", text_line)
-                text_line = re.sub(r"-+", "-", text_line)
-
-                # .Nm (manual name) macro line handling:
-                # - there may be several of them
-                # - the first ones should end with a comma for multi-commands man pages
-                # - may contain space+comma separation on the same line
-                # - may be enclosed in double quotes if they contain a white space
-                # - the filename is always mentioned, even if absent from the manual page file
-                if text_line.startswith(".Nm"):
-                    text_line = re.sub(r"^\.Nm ", "", text_line)
-                    text_line = re.sub(r" *,? *$", "", text_line)
-                    text_line = re.sub(r" *,", ",", text_line)
-                    text_line = re.sub(r'"', "", text_line)
-                    if "," not in text_line:
-                        if text_line not in items:
-                            items.append(text_line)
-                    else:
-                        for man_item in text_line.replace(" ", "").split(","):
-                            if man_item and man_item not in items:
-                                items.append(man_item)
-
-                # .Nd (one-line manual description) macro line handling:
-                # - may be alone on its line
-                # - may span on more than one line
-                # - may be enclosed in double quotes
-                elif text_line.startswith(".Nd"):
-                    text_line = re.sub(r"^\.Nd *\"?", "", text_line)
-                    text_line = re.sub(r"\"? *$", "", text_line)
-                    if text_line:
-                        whatis_text += "(" + section + ") - " + text_line
-                    else:
-                        whatis_text += "(" + section + ") -"
-
-                # .Sh NAME section end macro line:
-                elif text_line.startswith(".Sh") or text_line.startswith(".Ss"):
-                    items.sort()
-                    whatis_text = ", ".join(items) + whatis_text
-                    break
-
-                # Operating Systems macro lines handling:
-                elif text_line.startswith(".Ux"):
-                    whatis_text += " UNIX"
-                elif text_line.startswith(".At"):
-                    text_line = re.sub(r"^\.At *", "", text_line)
-                    if not text_line:
-                        whatis_text += " AT&T UNIX"
-                    elif text_line.startswith("v"):
-                        text_line = re.sub(r"^v", "Version ", text_line)
-                        whatis_text += " " + text_line + " AT&T UNIX"
-                    elif text_line.startswith("32v"):
-                        whatis_text += " Version 32V AT&T UNIX"
-                    elif text_line.startswith("III"):
-                        whatis_text += " AT&T System III UNIX"
-                    elif text_line.startswith("V."):
-                        text_line = re.sub(r"^V\.", "AT&T System V Release ", text_line)
-                        whatis_text += " " + text_line + " UNIX"
-                    elif text_line.startswith("V"):
-                        whatis_text += " AT&T System V UNIX"
-                elif text_line.startswith(".Bx"):
-                    text_line = re.sub(r"^\.Bx *", "", text_line)
-                    text_line = re.sub(r"-alpha", " (currently in alpha test)", text_line)
-                    text_line = re.sub(r"-beta", " (currently in beta test)", text_line)
-                    text_line = re.sub(r"-devel", " (currently under development)", text_line)
-                    if not text_line:
-                        whatis_text += " BSD"
-                    elif re.match(r"4\.3 ([Tt]ahoe|[Rr]eno)", text_line):
-                        text_line = re.sub(r" ", "  ", text_line)
-                        whatis_text += " " + text_line + "BSD"
-                    elif re.match(r"4\.4 [Ll]ite2?", text_line):
-                        text_line = re.sub(r"4\.4 [Ll]ite", "4.4BSD-Lite", text_line)
-                        whatis_text += " " + text_line
-                    else:
-                        whatis_text += " " + text_line + "BSD"
-                elif text_line.startswith(".Bsx"):
-                    text_line = re.sub(r"^\.Bsx", "BSD/OS", text_line)
-                    whatis_text += " " + text_line
-                elif text_line.startswith(".Nx"):
-                    text_line = re.sub(r"^\.Nx", "NetBSD", text_line)
-                    whatis_text += " " + text_line
-                elif text_line.startswith(".Fx"):
-                    text_line = re.sub(r"^\.Fx", "FreeBSD", text_line)
-                    whatis_text += " " + text_line
-                elif text_line.startswith(".Ox"):
-                    text_line = re.sub(r"^\.Ox", "OpenBSD", text_line)
-                    whatis_text += " " + text_line
-                elif text_line.startswith(".Dx"):
-                    text_line = re.sub(r"^\.Dx", "DragonFly", text_line)
-                    whatis_text += " " + text_line
-
-                # .Dq TEXT macro line handling:
-                # - the TEXT is sometimes already double quoted (ie. big(5))
-                elif text_line.startswith(".Dq"):
-                    if parameters["Interpret Dq"]:
-                        text_line = re.sub(r"^\.Dq ", '"', text_line)
-                        text_line = re.sub(r" *$", '"', text_line)
-                        text_line = re.sub(r'""', '"', text_line)
+                text_line = text_line.lower()
+                text_line = replace_roff_special_characters(text_line)
+                text_line = text_line.replace("\\\\_", "_")
+
+                # A single shlex.split() call is enough, and it already removes the quotes:
+                parts = shlex.split(text_line)
+                other_name = parts[1]
+                if other_name not in items_set:
+                    items.append(other_name)
+                    items_set.add(other_name)
+
+                other_section = parts[2]
+                if other_section != section:
+                    if other_section < section:
+                        section = other_section + ", " + section
                     else:
-                        text_line = re.sub(r"^\.Dq ", "", text_line)
-                    whatis_text += " " + text_line
-
-                # .Pa PATH macro line handling:
-                elif text_line.startswith(".Pa"):
-                    text_line = re.sub(r"^\.Pa ", parameters["Interpret Pa"], text_line)
-                    text_line = re.sub(r" *$", parameters["Interpret Pa"], text_line)
-                    whatis_text += " " + text_line
-
-                # .Xr MAN_ITEM MAN_SECTION macro line handling:
-                elif text_line.startswith(".Xr"):
-                    text_line = re.sub(r"^\.Xr ", "", text_line)
-                    if parameters["Interpret Xr"]:
-                        text_line = re.sub(r" ", "(", text_line, count=1)
-                        text_line = re.sub(r" *$", ")", text_line)
-                    whatis_text += " " + text_line
-
-                # Skip other macros
-                elif text_line.startswith("."):
-                    continue
-
-                # .Nd (one-line manual description) continuation text line handling:
-                # - may start with a .Xx macro
-                # - may be enclosed in double quotes
-                elif text_line.strip():
-                    text_line = re.sub(r"^\.[A-Za-z]+ \"?", "", text_line)
-                    text_line = re.sub(r"\"? *$", "", text_line)
-                    whatis_text += " " + text_line
-
-        if (text_line.startswith(".SH NAME") or text_line.startswith('.SH "NAME"')) \
-        and not parameters["No man pages"]:
-            logging.debug(text_line)
-            in_mandoc_section_name = True
-
-        elif text_line.startswith(".Sh NAME") \
-        and not parameters["No mdoc pages"]:
-            logging.debug(text_line)
-            in_mdoc_section_name = True
-
-        elif text_line.startswith(".TH") \
-        or text_line.startswith(".Dt"):
-            logging.debug(text_line)
-            text_line = replace_roff_user_defined_strings(text_line, defined_strings)
-            text_line = text_line.lower()
-            text_line = replace_roff_special_characters(text_line)
-            text_line = text_line.replace("\\\\_", "_")
-
-            other_name = shlex.split(text_line)[1]
-            other_name = re.sub(r'"', "", other_name)
-            if other_name not in items:
-                items.append(other_name)
-
-            other_section = shlex.split(text_line)[2]
-            other_section = re.sub(r'"', "", other_section)
-            if other_section != section:
-                if other_section < section:
-                    section = other_section + ", " + section
-                else:
-                    section = section + ", " + other_section
-
-        elif text_line.startswith(".SO") or text_line.startswith(".so"):
-            logging.debug(text_line)
-            # Follow non standard Groff SOurce redirection:
-            for directory in get_manpath_directories():
-                new_filename = directory + os.sep + text_line.split()[1]
-                new_section = re.sub(r"^.*\.", "", new_filename)
-                if not new_filename.endswith(".gz"):
-                    new_filename += ".gz"
-                if os.path.isfile(new_filename):
-                    if nb_of_so_redirections == 3:
-                        logging.critical("Too many .so source file redirections")
-                        sys.exit(1)
-
-                    whatis(new_filename, new_section, basename, nb_of_so_redirections + 1)
-                    break
-            return
-
-        # We only process ds (define string) macros at a line start
-        # though they can appear in other contexts:
-        elif text_line.startswith(".ds"):
-            logging.debug(text_line)
-            parts = text_line.split()
-            defined_strings[parts[1]] = parts[2]
-
-    if in_mandoc_section_name or in_mdoc_section_name:
-        if parameters["Print type"]:
-            if in_mandoc_section_name:
+                        section = section + ", " + other_section
+                    state["section"] = section
+
+            elif text_line.startswith(_SO_PREFIXES):
+                if _DEBUG_ENABLED:
+                    logging.debug(text_line)
+                # Follow non standard Groff SOurce redirection,
+                # using the cached directory indexes to avoid one stat() per directory:
+                referenced_name = text_line.split()[1]
+                new_section = _RE_LAST_DOT_PREFIX.sub("", referenced_name)
+                if not referenced_name.endswith(".gz"):
+                    referenced_name += ".gz"
+                for directory in get_manpath_directories():
+                    new_filename = directory + os.sep + referenced_name
+                    head, tail = os.path.split(new_filename)
+                    if tail in _get_directory_index(head) and os.path.isfile(new_filename):
+                        if nb_of_so_redirections == 3:
+                            logging.critical("Too many .so source file redirections")
+                            sys.exit(1)
+
+                        filename = new_filename
+                        section = new_section
+                        nb_of_so_redirections += 1
+                        redirected = True
+                        break
+                if not redirected:
+                    return None
+                break
+
+            # We only process ds (define string) macros at a line start
+            # though they can appear in other contexts:
+            elif text_line.startswith(".ds"):
+                if _DEBUG_ENABLED:
+                    logging.debug(text_line)
+                parts = text_line.split()
+                defined_strings[parts[1]] = parts[2]
+
+        if redirected:
+            continue
+
+        if in_mdoc_section_name:
+            whatis_text = state["whatis text"]
+
+        if in_mandoc_section_name or in_mdoc_section_name:
+            if print_type:
+                if in_mandoc_section_name:
+                    if nb_of_so_redirections:
+                        return whatis_text + "|" + "so(" + str(nb_of_so_redirections) + "):man"
+                    return whatis_text + "|" + "man"
                 if nb_of_so_redirections:
-                    print(whatis_text + "|" + "so(" + str(nb_of_so_redirections) + "):man")
-                else:
-                    print(whatis_text + "|" + "man")
-            elif nb_of_so_redirections:
-                print(whatis_text + "|" + "so(" + str(nb_of_so_redirections) + "):mdoc")
-            else:
-                print(whatis_text + "|" + "mdoc")
-        else:
-            print(whatis_text)
-    elif parameters["Print type"]:
-        print(basename + " - " + "|" + "other")
+                    return whatis_text + "|" + "so(" + str(nb_of_so_redirections) + "):mdoc"
+                return whatis_text + "|" + "mdoc"
+            return whatis_text
+        if print_type:
+            return basename + " - " + "|" + "other"
+
+        return None
 
 
 ################################################################################
+@functools.lru_cache(maxsize=None)
+def _get_directory_index(directory):
+    """Return the cached set of filenames in the given directory"""
+    if os.path.isdir(directory):
+        return frozenset(os.listdir(directory))
+
+    return frozenset()
+
+
+################################################################################
+@functools.lru_cache(maxsize=1)
 def get_manpath_directories():
-    """Return the list of directories in MANPATH"""
+    """Return the tuple of directories in MANPATH (computed only once)"""
     manual_directories = []
-    if "MANPATH" in os.environ.keys():
-        manual_directories = os.environ["MANPATH"].split(os.pathsep)
+    manpath = os.environ.get("MANPATH", "")
+    if manpath:
+        manual_directories = manpath.split(os.pathsep)
     else:
         if os.name == "posix":
             if os.path.isdir("/usr/share/man"):
@@ -620,11 +861,11 @@ def get_manpath_directories():
         elif os.name == "nt":
             pnu_manpath = os.sep + "python" + os.sep + "man"
             appdata_path = os.sep + "appdata" + os.sep + "roaming"
-            if os.environ["APPDATA"]:
+            if os.environ.get("APPDATA"):
                 pnu_manpath = os.environ["APPDATA"] + pnu_manpath
-            elif os.environ["HOMEPATH"]:
+            elif os.environ.get("HOMEPATH"):
                 pnu_manpath = os.environ["HOMEPATH"] + appdata_path + pnu_manpath
-            elif os.environ["USERPROFILE"]:
+            elif os.environ.get("USERPROFILE"):
                 pnu_manpath = os.environ["USERPROFILE"] + appdata_path + pnu_manpath
             if os.path.isdir(pnu_manpath):
                 manual_directories.append(pnu_manpath)
@@ -633,31 +874,83 @@ def get_manpath_directories():
             if os.path.isdir(pnu_manpath2):
                 manual_directories.append(pnu_manpath2)
 
-    return manual_directories
+    return tuple(manual_directories)
+
+
+################################################################################
+def _initialize_worker(main_parameters):
+    """Propagate the command line parameters to a worker process"""
+    # pylint: disable=C0103
+    global parameters
+    # pylint: enable=C0103
+    parameters = main_parameters
+
+
+################################################################################
+def _whatis_worker(job):
+    """Process one man page file on behalf of show_section_contents()"""
+    return whatis(*job)
 
 
 ################################################################################
 def show_section_contents(section):
     """Show the man pages in a section of the Manual"""
+    # The basename stripping pattern only depends on the section,
+    # so compile it once before the per-file loop:
+    basename_pattern = re.compile(r"\." + re.escape(section) + r"\.[A-Za-z0-9]*$")
     for directory in get_manpath_directories():
         manual_section = directory + os.sep + "man" + section
         if os.path.isdir(manual_section):
-            files = os.listdir(manual_section)
-            files.sort()
-            for name in files:
-                if os.path.isfile(manual_section + os.sep + name):
-                    basename = re.sub(r"\." + section + r"\.[A-Za-z0-9]*$", "", name)
-                    whatis(manual_section + os.sep + name, section, basename, 0)
+            # scandir() entries answer is_file() from the directory read itself,
+            # saving one stat() syscall per file:
+            with os.scandir(manual_section) as entries:
+                files = sorted(
+                    (entry for entry in entries if entry.is_file()),
+                    key=lambda entry: entry.name,
+                )
+            jobs = [
+                (entry.path, section, basename_pattern.sub("", entry.name), 0)
+                for entry in files
+            ]
+
+            # Each man page is processed independently, so large sections are
+            # spread over all processors. Small ones are not worth the
+            # processes start up time:
+            if len(jobs) < 32:
+                results = [whatis(*job) for job in jobs]
+            else:
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    initializer=_initialize_worker,
+                    initargs=(parameters,),
+                ) as executor:
+                    results = executor.map(_whatis_worker, jobs, chunksize=16)
+
+            for result in results:
+                if result is not None:
+                    print(result)
 
 
 ################################################################################
 def main():
     """The program's main entry point"""
     program_name = os.path.basename(sys.argv[0])
+    # pylint: disable=C0103
+    global _DEBUG_ENABLED
+    # pylint: enable=C0103
+
+    # Buffer standard output so a full section costs a handful of write
+    # syscalls instead of one per man page:
+    if hasattr(sys.stdout, "buffer"):
+        sys.stdout = io.TextIOWrapper(
+            io.BufferedWriter(sys.stdout.buffer, 1 << 16), write_through=False
+        )
+        atexit.register(sys.stdout.flush)
 
     initialize_debugging(program_name)
     process_environment_variables()
     arguments = process_command_line()
+    _DEBUG_ENABLED = logging.getLogger().isEnabledFor(logging.DEBUG)
 
     if not arguments and not parameters["Files"]:
         show_manual_sections()
@@ -665,10 +958,12 @@ def main():
         if parameters["Files"]:
             for page in parameters["Files"]:
                 basename = os.path.basename(page)
-                section = re.sub(r"\.[A-Za-z0-9]*$", "", basename)
-                basename = re.sub(r"\.[A-Za-z0-9]+$", "", section)
-                section = re.sub(r"^.*\.", "", section)
-                whatis(page, section, basename, 0)
+                section = _RE_FILE_EXTENSION.sub("", basename)
+                basename = _RE_NON_EMPTY_EXTENSION.sub("", section)
+                section = _RE_LAST_DOT_PREFIX.sub("", section)
+                result = whatis(page, section, basename, 0)
+                if result is not None:
+                    print(result)
         if arguments:
             for argument in arguments:
                 show_section_contents(argument)